@@ -0,0 +1,176 @@
+-- Database functions used by first_model/database/Database.py.
+-- Apply once in the Supabase SQL editor, BEFORE deploying the Python code that
+-- relies on it: inserts omit the primary key and created_at and expect the
+-- column defaults below to fill them in.
+
+-- ---------------------------------------------------------------------------
+-- Primary key sequences: one per table, started just above the current max id.
+-- ---------------------------------------------------------------------------
+create sequence if not exists "Project_reserve_seq";
+create sequence if not exists "Document_reserve_seq";
+create sequence if not exists "Audit_reserve_seq";
+create sequence if not exists "Issue_reserve_seq";
+create sequence if not exists "Conversation_reserve_seq";
+create sequence if not exists "Message_reserve_seq";
+create sequence if not exists "Article_Entry_reserve_seq";
+
+select setval('"Project_reserve_seq"', coalesce((select max(project_id) from "Project"), 0) + 1, false);
+select setval('"Document_reserve_seq"', coalesce((select max(doc_id) from "Document"), 0) + 1, false);
+select setval('"Audit_reserve_seq"', coalesce((select max(audit_id) from "Audit"), 0) + 1, false);
+select setval('"Issue_reserve_seq"', coalesce((select max(issue_id) from "Issue"), 0) + 1, false);
+select setval('"Conversation_reserve_seq"', coalesce((select max(conv_id) from "Conversation"), 0) + 1, false);
+select setval('"Message_reserve_seq"', coalesce((select max(msg_id) from "Message"), 0) + 1, false);
+select setval('"Article_Entry_reserve_seq"', coalesce((select max(ent_id) from "Article_Entry"), 0) + 1, false);
+
+-- ---------------------------------------------------------------------------
+-- Server-side primary keys: inserts that omit the id draw it from the same
+-- sequences with a plain nextval (lock-free) and read it back via
+-- INSERT ... RETURNING. Set before replacing reserve_ids, which the old
+-- defaults depended on. A column created as GENERATED ... AS IDENTITY cannot
+-- also have a default, so any identity is dropped first and the sequences
+-- above are the single id source.
+-- ---------------------------------------------------------------------------
+alter table "Project" alter column project_id drop identity if exists;
+alter table "Document" alter column doc_id drop identity if exists;
+alter table "Audit" alter column audit_id drop identity if exists;
+alter table "Issue" alter column issue_id drop identity if exists;
+alter table "Conversation" alter column conv_id drop identity if exists;
+alter table "Message" alter column msg_id drop identity if exists;
+alter table "Article_Entry" alter column ent_id drop identity if exists;
+
+alter table "Project" alter column project_id set default nextval('"Project_reserve_seq"');
+alter table "Document" alter column doc_id set default nextval('"Document_reserve_seq"');
+alter table "Audit" alter column audit_id set default nextval('"Audit_reserve_seq"');
+alter table "Issue" alter column issue_id set default nextval('"Issue_reserve_seq"');
+alter table "Conversation" alter column conv_id set default nextval('"Conversation_reserve_seq"');
+alter table "Message" alter column msg_id set default nextval('"Message_reserve_seq"');
+alter table "Article_Entry" alter column ent_id set default nextval('"Article_Entry_reserve_seq"');
+
+-- reserve_ids(t, n): n ids for table t in one call (e.g. when ids are needed
+-- before the insert). nextval is atomic, so no lock is taken: concurrent
+-- callers get disjoint, not necessarily consecutive, ids.
+drop function if exists reserve_ids(text, int);
+create or replace function reserve_ids(t text, n int default 1)
+returns bigint[]
+language sql
+as $$
+  select array(
+    select nextval(format('%I', t || '_reserve_seq')::regclass)
+    from generate_series(1, n)
+  );
+$$;
+
+-- sync_id_sequence(t, id): after a row of table t was inserted with a caller-
+-- chosen id, move the sequence to greatest(last_value, id) so a later default
+-- nextval cannot hand out the same id. Never moves the sequence backwards.
+create or replace function sync_id_sequence(t text, id bigint)
+returns void
+language plpgsql
+as $$
+declare
+  seq regclass := format('%I', t || '_reserve_seq')::regclass;
+  last bigint;
+begin
+  execute format('select last_value from %s', seq) into last;
+  if id >= last then
+    perform setval(seq, id);
+  end if;
+end;
+$$;
+
+-- ---------------------------------------------------------------------------
+-- Store Article_Entry embeddings as FP16 (pgvector >= 0.7). Database.py already
+-- rounds to FP16 before sending, so this only halves on-disk and index size.
+-- ---------------------------------------------------------------------------
+alter table "Article_Entry" alter column embedding type halfvec(768) using embedding::halfvec(768);
+
+-- ---------------------------------------------------------------------------
+-- created_at is filled in by the database; Database.py no longer sends it.
+-- ---------------------------------------------------------------------------
+alter table "Project" alter column created_at set default now();
+alter table "Document" alter column created_at set default now();
+alter table "Audit" alter column created_at set default now();
+alter table "Issue" alter column created_at set default now();
+alter table "Conversation" alter column created_at set default now();
+alter table "Message" alter column created_at set default now();
+alter table "Article_Entry" alter column created_at set default now();
+
+-- ---------------------------------------------------------------------------
+-- Issue.evidence as jsonb: PostgREST returns it parsed and it can be filtered
+-- server-side ({ "doc_id": ["span19", ...] }).
+-- ---------------------------------------------------------------------------
+alter table "Issue" alter column evidence type jsonb using evidence::jsonb;
+
+-- ---------------------------------------------------------------------------
+-- Article_Entry embeddings are L2-normalised by the client (quantize_embedding
+-- in Database.py), so this table and the vecs collection hold the same vector.
+-- Drop the normalising trigger an earlier version of this script created.
+-- ---------------------------------------------------------------------------
+drop trigger if exists article_entry_normalize_embedding on "Article_Entry";
+drop function if exists normalize_article_embedding();
+
+-- ---------------------------------------------------------------------------
+-- Document.span_offsets: { "span3": {"start": 120, "end": 188}, ... } computed by
+-- Database.save_document from content + content_span, so reads skip span parsing.
+-- ---------------------------------------------------------------------------
+alter table "Document" add column if not exists span_offsets jsonb;
+
+-- ---------------------------------------------------------------------------
+-- get_document_highlights(pid, did): everything load_document_with_highlighting
+-- needs in one round-trip. Span offsets are looked up in Python from "spans"
+-- (the evidence span ids) and span_offsets, or content_span for older rows.
+-- ---------------------------------------------------------------------------
+create or replace function get_document_highlights(pid bigint, did bigint)
+returns jsonb
+language sql
+stable
+as $$
+  with doc as (
+    select content, content_span, span_offsets
+    from "Document"
+    where project_id = pid and doc_id = did
+  ),
+  issues as (
+    select i.issue_id, i.issue_description, i.clarification_qn, i.evidence -> did::text as spans
+    from "Issue" i
+    join "Audit" a on a.audit_id = i.audit_id
+    where a.project_id = pid and i.evidence ? did::text
+  ),
+  convs as (
+    select distinct on (c.issue_id) c.issue_id, c.conv_id
+    from "Conversation" c
+    join issues i on i.issue_id = c.issue_id
+    order by c.issue_id, c.conv_id
+  ),
+  comments as (
+    select cv.issue_id,
+           jsonb_agg(jsonb_build_object(
+             'id', m.msg_id,
+             'author', case when m.type = 'ai' then 'GeoCompliance AI' else 'User' end,
+             'content', m.content,
+             'type', case when m.type = 'ai' then 'system' else 'user' end,
+             'timestamp', m.created_at
+           ) order by m.created_at) as comments
+    from convs cv
+    join "Message" m on m.conv_id = cv.conv_id
+    group by cv.issue_id
+  )
+  select jsonb_build_object(
+    'title', 'DOCUMENT',
+    'content', doc.content,
+    'content_span', doc.content_span,
+    'span_offsets', doc.span_offsets,
+    'highlights', coalesce((
+      select jsonb_agg(jsonb_build_object(
+        'id', i.issue_id,
+        'spans', i.spans,
+        'reason', i.issue_description,
+        'clarification_qn', i.clarification_qn,
+        'comments', cm.comments
+      ) order by i.issue_id)
+      from issues i
+      join comments cm on cm.issue_id = i.issue_id
+    ), '[]'::jsonb)
+  )
+  from doc;
+$$;
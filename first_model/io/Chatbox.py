@@ -1,25 +1,46 @@
 import logging
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
 
 from ..database.Database import Database
 
+# Configured once at import; IO creates a Chatbox per conversation
+_LOGGER = logging.getLogger(__name__ + ".Chatbox")
+if not _LOGGER.handlers:
+    _LOGGER.addHandler(logging.StreamHandler())
+_LOGGER.setLevel(logging.INFO)
+
+
+@dataclass(slots=True)
+class MsgRow:
+    """One Message row held in a chatbox's history (the MESSAGE_COLUMNS of the Message table)."""
+
+    msg_id: Optional[int] = None
+    conv_id: Optional[int] = None
+    type: Optional[str] = None
+    content: Optional[str] = None
+    created_at: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "MsgRow":
+        return cls(**{name: row[name] for name in _MSG_FIELDS if name in row})
+
+
+_MSG_FIELDS = tuple(f.name for f in fields(MsgRow))
+
 
 class Chatbox:
     """Container for a single conversation's state and history.
 
     Responsibilities:
     - Hold a conv_id that identifies the conversation.
-    - Load message history from the database on initialization (optional).
+    - Load the most recent message history on initialization (optional); older pages on demand.
     - Provide getters to retrieve sorted history for the server/UI.
     - Append new messages (user/system/agent) and persist them.
     """
 
     def __init__(self, database: Database, conv_id: Optional[int] = None, preload: bool = True):
-        self.logger = logging.getLogger(__name__ + ".Chatbox")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            self.logger.addHandler(handler)
-        self.logger.setLevel(logging.INFO)
+        self.logger = _LOGGER
 
         self._db = database
         # Ensure a conversation exists or create one via Database helper
@@ -28,7 +49,13 @@ class Chatbox:
         except Exception:
             # Fallback: trust provided conv_id if DB helper fails; caller should ensure validity
             self.conv_id = conv_id
-        self.messages: List[Dict[str, Any]] = []
+        self.messages: List[MsgRow] = []
+        # Immutable snapshot handed out by get_history; rebuilt lazily after the history changes
+        self._history_tuple: Optional[Tuple[MsgRow, ...]] = None
+        # created_at of the newest message held locally; keyset bound for fetch_newer
+        self.last_created_at: Optional[str] = None
+        # True once the oldest message of the conversation is held (nothing left for fetch_older)
+        self.complete = False
 
         if preload:
             self.reload()
@@ -36,21 +63,79 @@ class Chatbox:
     # ------------------------
     # Data accessors
     # ------------------------
-    def reload(self) -> None:
-        """Reload messages for this conversation from the database and sort by created_at asc."""
+    def reload(self, limit: Optional[int] = 50) -> None:
+        """Reload the latest `limit` messages (all when None) from the database, sorted by created_at asc."""
+        self._history_tuple = None
         if self.conv_id is None:
             self.logger.warning("reload called without a conv_id")
             self.messages = []
             return
         try:
-            self.messages = list(self._db.load_messages_for_conversation(self.conv_id) or [])
+            rows = self._db.load_messages_for_conversation(self.conv_id, limit=limit) or []
+            self.messages = [MsgRow.from_row(row) for row in rows]
+            self.complete = limit is None or len(rows) < limit
         except Exception as e:
             self.logger.exception("Failed to reload messages: %s", e)
             self.messages = []
+            self.complete = False
+        self.last_created_at = self.messages[-1].created_at if self.messages else None
+
+    def fetch_older(self, before_ts: Optional[str] = None, limit: Optional[int] = 50) -> List[MsgRow]:
+        """Scroll back: load up to `limit` messages (all when None) older than before_ts (default: the
+        oldest held). They are prepended to the history only when they end right where it starts.
+        """
+        if self.conv_id is None:
+            return []
+        oldest = self.messages[0].created_at if self.messages else None
+        if before_ts is None:
+            if oldest is None:
+                return []
+            before_ts = oldest
+        try:
+            rows = self._db.load_messages_for_conversation(self.conv_id, limit=limit, before=before_ts) or []
+        except Exception as e:
+            self.logger.exception("Failed to fetch older messages: %s", e)
+            return []
+        older = [MsgRow.from_row(row) for row in rows]
+        if before_ts == oldest:
+            if older:
+                self.messages[:0] = older
+                self._history_tuple = None
+            if limit is None or len(older) < limit:
+                self.complete = True
+        return older
+
+    def ensure_loaded(self, n: Optional[int] = None) -> None:
+        """Make sure the newest n messages (all when None) are held, fetching only the missing older ones."""
+        if self.complete or (n is not None and len(self.messages) >= n):
+            return
+        if not self.messages:
+            self.reload(limit=n)
+        else:
+            self.fetch_older(limit=None if n is None else n - len(self.messages))
+
+    def fetch_newer(self) -> List[MsgRow]:
+        """Append only the messages created after the newest one held, instead of reloading the history."""
+        if self.last_created_at is None:
+            self.reload()
+            return list(self.messages)
+        try:
+            rows = self._db.load_messages_for_conversation(self.conv_id, after=self.last_created_at) or []
+        except Exception as e:
+            self.logger.exception("Failed to fetch newer messages: %s", e)
+            return []
+        newer = [MsgRow.from_row(row) for row in rows]
+        if newer:
+            self.messages.extend(newer)
+            self.last_created_at = newer[-1].created_at
+            self._history_tuple = None
+        return newer
 
-    def get_history(self) -> List[Dict[str, Any]]:
-        """Return a copy of sorted message history for this chatbox."""
-        return list(self.messages)
+    def get_history(self) -> Tuple[MsgRow, ...]:
+        """Return the sorted message history as a tuple, built once per change rather than copied per call."""
+        if self._history_tuple is None:
+            self._history_tuple = tuple(self.messages)
+        return self._history_tuple
 
     # ------------------------
     # Mutations
@@ -71,7 +156,9 @@ class Chatbox:
             resp = self._db.save_message(message=payload.get("content"), type=payload.get("type"), conv_id=self.conv_id)
             row = (getattr(resp, "data", None) or [None])[0]
             if row:
-                self.messages.append(row)
+                self.messages.append(MsgRow.from_row(row))
+                self.last_created_at = row.get("created_at", self.last_created_at)
+                self._history_tuple = None
             return row
         except Exception as e:
             self.logger.exception("Failed to append message: %s", e)
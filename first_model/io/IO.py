@@ -1,5 +1,18 @@
+import asyncio
+import concurrent.futures
+import hashlib
 import logging
-from typing import Optional, Dict, Any, List
+import os
+import queue
+import threading
+from typing import Optional, Dict, Any, List, AsyncGenerator, Awaitable
+
+import anthropic
+import httpx
+import orjson
+from cachetools import LRUCache, TTLCache, cached
+from cachetools.keys import hashkey
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 # Prefer package-relative imports so this works when imported as first_model.io.IO
 from ..database.Database import Database
@@ -7,6 +20,175 @@ from ..model.Auditor import Auditor
 from ..model.Attacker import Attacker
 from .Chatbox import Chatbox
 
+
+# Configured once at import rather than per IO instance
+_LOGGER = logging.getLogger(__name__ + ".IO")
+if not _LOGGER.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+    _LOGGER.addHandler(_handler)
+_LOGGER.setLevel(logging.INFO)
+
+
+# Bound on live chatboxes per IO; the least recently used are dropped and rebuilt from the DB on next use
+CHATBOX_CACHE_SIZE = int(os.environ.get("IO_CHATBOX_CACHE", "2048"))
+
+# Max queued messages the background writer sends in one insert request
+WRITE_BATCH_MAX = 100
+
+# Constant fields of the mock attacker's scenarios; tuples so every scenario can share them
+_MOCK_VIOLATIONS = ("General Safety", "Privacy")
+_MOCK_JURISDICTIONS = ("Generic",)
+_MOCK_PRD_SPANS = ()
+_MOCK_DESCRIPTION = "Scenario {n}: Potential misuse pathway referencing PRD {prd} (Attack vector: unspecified)"
+_MOCK_RATIONALE = "Generated by mock attacker due to unavailable LLM."
+_MOCK_QUESTION = "Can you provide more details about user consent and data flows?"
+
+# Provider failures worth retrying: rate limits, 5xx, dropped connections and timeouts
+_TRANSIENT = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.APIConnectionError,  # includes APITimeoutError
+    httpx.TransportError,
+    TimeoutError,
+)
+# Process-wide cap on in-flight agent (LLM) calls across all IO instances and pipeline runs.
+# A thread semaphore, since the calls run on worker threads and the sync paths use their own loops.
+LLM_CONCURRENCY = int(os.environ.get("IO_LLM_CONCURRENCY", "32"))
+_LLM_SLOTS = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+LLM_MAX_RETRIES = int(os.environ.get("IO_LLM_RETRIES", "3"))
+_llm_backoff = dict(
+    retry=retry_if_exception_type(_TRANSIENT),
+    wait=wait_random_exponential(multiplier=1, max=20),
+    stop=stop_after_attempt(LLM_MAX_RETRIES + 1),
+    reraise=True,
+)
+
+# Marks an agent whose construction failed, so it is not retried on every access
+_MISSING = object()
+
+
+def _load_law():
+    # Imported here so missing optional deps (e.g., transformers) don't break server startup
+    from ..model.Law import Law
+    return Law()
+
+
+def _event(payload: Dict[str, Any]) -> bytes:
+    """One NDJSON line of a streamed response."""
+    return orjson.dumps(payload, default=str) + b"\n"
+
+
+def _retry(fn, *args, **kwargs):
+    """fn(*args, **kwargs), retried with jittered exponential backoff on transient provider errors.
+    Runs on the caller's worker thread, so a backing-off call keeps its concurrency slot.
+    """
+    for attempt in Retrying(**_llm_backoff):
+        with attempt:
+            return fn(*args, **kwargs)
+
+
+def _llm_call(fn, *args, **kwargs):
+    """An agent call under the process-wide concurrency cap, with _retry's backoff."""
+    with _LLM_SLOTS:
+        return _retry(fn, *args, **kwargs)
+
+
+# Every Database shares one Supabase client, so the key is k alone
+@cached(TTLCache(maxsize=4, ttl=300), key=lambda database, k: hashkey(k), lock=threading.Lock())
+def _fetch_mock_ent_ids(database: Database, k: int) -> tuple:
+    rows = (
+        database.supabase
+        .table("Article_Entry")
+        .select("ent_id")
+        .limit(k)
+        .execute()
+    ).data or []
+    return tuple(int(r.get("ent_id")) for r in rows if r.get("ent_id") is not None)
+
+
+def _mock_ent_ids(database: Database, k: int = 3) -> List[int]:
+    """A few real ent_ids from Article_Entry as a best-effort stand-in for Law; failures are not cached."""
+    try:
+        ids = _fetch_mock_ent_ids(database, k)
+    except Exception:
+        ids = ()
+    return list(ids) or [1, 2, 3][:k]
+
+
+_NO_AUDIT = ("", None, "")
+
+
+def _normalize_audit(resp: Any) -> tuple:
+    """(reasoning, evidence, clarification_question) from an Auditor response: a dict, or a list whose first item is one."""
+    if type(resp) is list:
+        resp = resp[0] if resp else None
+    if type(resp) is not dict:
+        return _NO_AUDIT
+    get = resp.get
+    return get("reasoning", ""), get("evidence"), get("clarification_question", "")
+
+
+def _read_text(file: str, encoding: str = "utf-8") -> str:
+    with open(file, "r", encoding=encoding) as f:
+        return f.read()
+
+# Event loop thread for the sync wrappers when they are called from inside a running loop
+# (e.g. an async FastAPI route or a notebook), where asyncio.run() would raise
+_BG_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_BG_LOOP_LOCK = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _BG_LOOP
+    with _BG_LOOP_LOCK:
+        if _BG_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="io-sync-loop", daemon=True).start()
+            _BG_LOOP = loop
+    return _BG_LOOP
+
+def _run_sync(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion from synchronous code: asyncio.run() when no loop is running
+    in this thread, otherwise on the shared background loop (blocking this thread until done).
+    Async callers should await the *_async method instead.
+    """
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    if running is _BG_LOOP:
+        coro.close()
+        raise RuntimeError("sync IO wrapper called from its own background loop; await the *_async method")
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+async def _none() -> None:
+    """Placeholder awaitable for an agent that is not available."""
+    return None
+
+
+def _mock_scenarios(max_n: int, ent_ids: List[int], prd_doc_id: int) -> List[Dict[str, Any]]:
+    """Stand-in Attacker output; constant columns are shared by every scenario (read-only downstream)."""
+    citations = tuple(ent_ids[:3]) or (1,)
+    return [{
+        "description": _MOCK_DESCRIPTION.format(n=i + 1, prd=prd_doc_id),
+        "potential_violations": _MOCK_VIOLATIONS,
+        "jurisdictions": _MOCK_JURISDICTIONS,
+        "law_citations": citations,
+        "rationale": _MOCK_RATIONALE,
+        "prd_spans": _MOCK_PRD_SPANS,
+    } for i in range(max_n)]
+
+
+async def _mock_audit(scenario: Any) -> Dict[str, Any]:
+    """Stand-in Auditor response for one scenario."""
+    return {
+        "reasoning": f"Mock reasoning for scenario: {scenario.get('description', 'N/A')}",
+        "evidence": None,  # Optional; when None, no highlights will render
+        "clarification_question": _MOCK_QUESTION,
+    }
+
+
 class IO:
     """
     IO is the façade between the FastAPI server and the internal system
@@ -18,45 +200,92 @@ class IO:
     - never raise on expected failures; capture and return error string
     """
 
-    def __init__(self):
-        # Logger setup
-        self.logger = logging.getLogger(__name__ + ".IO")
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-            )
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
-        self.logger.setLevel(logging.INFO)
+    def __init__(self, database: Optional[Database] = None):
+        self.logger = _LOGGER
 
-        # Core services
-        self.database = Database()
+        # Core services; pass the app's Database to share it (all instances use one Supabase pool either way)
+        self.database = database if database is not None else Database()
 
-        # Agents are optional; initialize safely so missing env doesn't break the server
-        self.auditor = None
-        self.attacker = None
-        self.law = None
-        try:
-            self.auditor = Auditor()
-        except Exception as e:
-            self.logger.warning(f"Auditor init skipped: {e}")
-        try:
-            self.attacker = Attacker()
-        except Exception as e:
-            self.logger.warning(f"Attacker init skipped: {e}")
-        try:
-            # Lazy import so missing optional deps (e.g., transformers) don't break server startup
-            from ..model.Law import Law as _Law
-            self.law = _Law()
-        except Exception as e:
-            self.logger.warning(f"Law init skipped: {e}")
+        # Agents are optional and built on first use (see the auditor/attacker/law properties),
+        # so endpoints that never touch them don't pay for their construction
+        self._auditor = None
+        self._attacker = None
+        self._law = None
+        self._agent_lock = threading.Lock()
+        self._refresh_capabilities()
+
+        # Auditor/attacker results for recently seen message text (retries, duplicate submissions)
+        self._audit_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+        self._attack_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+        self._agent_cache_lock = threading.Lock()
+
+        # Active chatboxes by conv_id, least recently used evicted past CHATBOX_CACHE_SIZE
+        self._chatboxes: Dict[int, Chatbox] = LRUCache(maxsize=CHATBOX_CACHE_SIZE)
+        self._chatbox_lock = threading.Lock()
 
-        # Active chatboxes by conv_id
-        self._chatboxes: Dict[int, Chatbox] = {}
+        # Background writer: input_message queues (message, type, future) here instead of waiting on
+        # Supabase; the future resolves to the stored row or the write's exception
+        self._write_q: "queue.Queue[tuple[str, Optional[str], concurrent.futures.Future]]" = queue.Queue()
+        self._failed_writes = 0
+        self._writer = threading.Thread(target=self._write_loop, name="io-writer", daemon=True)
+        self._writer.start()
 
         self.logger.info("IO initialized")
 
+    # ------------------------
+    # Agents (lazy)
+    # ------------------------
+    def _agent(self, attr: str, factory, label: str) -> Any:
+        value = getattr(self, attr)
+        if value is None:
+            with self._agent_lock:
+                value = getattr(self, attr)
+                if value is None:
+                    try:
+                        value = factory()
+                    except Exception as e:
+                        self.logger.warning(f"{label} init skipped: {e}")
+                        value = _MISSING
+                    setattr(self, attr, value)
+                    self._refresh_capabilities()
+        return None if value is _MISSING else value
+
+    def _refresh_capabilities(self) -> None:
+        # Which agent methods exist, checked once per agent change instead of hasattr on every call.
+        # Valid once the agent property has been read (that is what builds the agent)
+        auditor, attacker, law = (None if agent is _MISSING else agent for agent in (self._auditor, self._attacker, self._law))
+        self._has_audit = callable(getattr(auditor, "audit", None))
+        self._has_attack = callable(getattr(attacker, "attack", None))
+        self._has_run_attack = callable(getattr(attacker, "run_attack", None))
+        self._has_law_audit = callable(getattr(law, "audit", None))
+
+    @property
+    def auditor(self):
+        return self._agent("_auditor", Auditor, "Auditor")
+
+    @auditor.setter
+    def auditor(self, value):
+        self._auditor = value
+        self._refresh_capabilities()
+
+    @property
+    def attacker(self):
+        return self._agent("_attacker", Attacker, "Attacker")
+
+    @attacker.setter
+    def attacker(self, value):
+        self._attacker = value
+        self._refresh_capabilities()
+
+    @property
+    def law(self):
+        return self._agent("_law", _load_law, "Law")
+
+    @law.setter
+    def law(self, value):
+        self._law = value
+        self._refresh_capabilities()
+
     def display(self, audit_response, attack_response):
         print("Audit Response:", audit_response)
         print("Attack Response:", attack_response)
@@ -70,6 +299,70 @@ class IO:
     def _err(self, msg: str) -> Dict[str, Any]:
         return {"ok": False, "data": None, "error": msg}
 
+    def _cached_agent_call(self, cache: TTLCache, fn, message: str) -> Any:
+        """fn(message), served from cache when the same text was handled within the TTL."""
+        key = hashlib.blake2b(message.encode(), digest_size=16).digest()
+        with self._agent_cache_lock:
+            if key in cache:
+                return cache[key]
+        result = _llm_call(fn, message)
+        with self._agent_cache_lock:
+            cache[key] = result
+        return result
+
+    def _audit_message(self, message: str) -> Any:
+        return self._cached_agent_call(self._audit_cache, self.auditor.audit, message)
+
+    def _attack_message(self, message: str) -> Any:
+        return self._cached_agent_call(self._attack_cache, self.attacker.attack, message)
+
+    def _write_loop(self) -> None:
+        """Drain queued messages; what is waiting at wake-up (up to WRITE_BATCH_MAX) goes out as one insert."""
+        while True:
+            items = [self._write_q.get()]
+            while len(items) < WRITE_BATCH_MAX:
+                try:
+                    items.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                # Messages are not tied to a conversation here: as with save_message, each gets its
+                # own new one (or the Database's conv_id when set), created in a single request
+                conv_id = getattr(self.database, "conv_id", None)
+                if conv_id is None:
+                    conv_ids = self.database.insert_many_returning_ids("Conversation", [{"audit_id": None} for _ in items])
+                else:
+                    conv_ids = [conv_id] * len(items)
+                payloads = [
+                    {"type": type, "content": message, "conv_id": cid}
+                    for (message, type, _), cid in zip(items, conv_ids)
+                ]
+                # Local payloads and one multi-row insert; the response has the rows in request order
+                response = self.database.save_data_many("Message", payloads)
+                rows = (response.data if response is not None else None) or []
+                for i, (_, _, done) in enumerate(items):
+                    done.set_result(rows[i] if i < len(rows) else None)
+            except Exception as e:
+                self._failed_writes += len(items)
+                self.logger.exception(f"background save of {len(items)} message(s) failed")
+                for _, _, done in items:
+                    done.set_exception(e)
+            finally:
+                for _ in items:
+                    self._write_q.task_done()
+
+    def _submit_write(self, message: str, type: Optional[str]) -> concurrent.futures.Future:
+        done: concurrent.futures.Future = concurrent.futures.Future()
+        self._write_q.put_nowait((message, type, done))
+        return done
+
+    def flush_writes(self) -> int:
+        """Block until every queued message has been written; called on app shutdown.
+        Returns how many queued writes have failed since startup.
+        """
+        self._write_q.join()
+        return self._failed_writes
+
     # ------------------------
     # Health / Info
     # ------------------------
@@ -77,46 +370,81 @@ class IO:
         return self._ok({"service": "io", "status": "ok"})
 
     def status(self) -> Dict[str, Any]:
-        try:
-            # Lightweight DB check (does not query network if DB object creation failed)
-            has_db = self.database is not None
-            agents = []
-            if self.auditor is not None:
-                agents.append("auditor")
-            if self.attacker is not None:
-                agents.append("attacker")
-            if self.law is not None:
-                agents.append("law")
-            return self._ok({"db": has_db, "agents": agents})
-        except Exception as e:
-            self.logger.exception("Status check failed")
-            return self._err(str(e))
+        # Lightweight DB/agent check (no network access, doesn't build agents). Every configured
+        # agent is listed with its state: "lazy" (not built yet), "ready" or "failed" (init raised)
+        agents = {
+            name: "lazy" if agent is None else "failed" if agent is _MISSING else "ready"
+            for name, agent in (("auditor", self._auditor), ("attacker", self._attacker), ("law", self._law))
+        }
+        return self._ok({
+            "db": self.database is not None,
+            "agents": agents,
+            "writes": {"pending": self._write_q.unfinished_tasks, "failed": self._failed_writes},
+        })
 
     # ------------------------
     # Messaging
     # ------------------------
+    def _cached_chatbox(self, conv_id: int) -> Optional[Chatbox]:
+        # LRUCache lookups reorder entries, so they share the lock with inserts
+        with self._chatbox_lock:
+            return self._chatboxes.get(conv_id)
+
+    def _get_chatbox(self, conv_id: int) -> Optional[Chatbox]:
+        """The live chatbox for conv_id; one evicted from the LRU is rebuilt from the DB.
+        None only when the conversation does not exist (unknown ids are not created here).
+        """
+        cb = self._cached_chatbox(conv_id)
+        if cb is not None:
+            return cb
+        if not self.database.load_data("Conversation", columns="conv_id", conv_id=conv_id):
+            return None
+        cb = Chatbox(self.database, conv_id=conv_id, preload=True)
+        with self._chatbox_lock:
+            return self._chatboxes.setdefault(conv_id, cb)
+
     def get_or_create_chatbox(self, conv_id: Optional[int] = None, preload: bool = True) -> Dict[str, Any]:
-        """Return a chatbox for the given conv_id, creating it if necessary."""
+        """Return a chatbox for the given conv_id, creating it if necessary.
+        An unknown conv_id creates a conversation with a new id; data["conv_id"] is the one to use.
+        """
         try:
-            if conv_id is not None and conv_id in self._chatboxes:
+            if conv_id is not None and self._cached_chatbox(conv_id) is not None:
                 return self._ok({"conv_id": conv_id, "created": False})
             cb = Chatbox(self.database, conv_id=conv_id, preload=preload)
             if cb.conv_id is None:
                 return self._err("failed to create or resolve conversation id")
-            self._chatboxes[cb.conv_id] = cb
+            with self._chatbox_lock:
+                # A concurrent call may have registered this conversation meanwhile; keep that one
+                if self._chatboxes.setdefault(cb.conv_id, cb) is not cb:
+                    return self._ok({"conv_id": cb.conv_id, "created": False})
             return self._ok({"conv_id": cb.conv_id, "created": True})
         except Exception as e:
             self.logger.exception("get_or_create_chatbox failed")
             return self._err(str(e))
 
-    def get_history(self, conv_id: int, reload: bool = False) -> Dict[str, Any]:
+    def get_history(self, conv_id: int, reload: bool = False, before: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Messages of a conversation, oldest first. By default the full history; with `limit` only
+        the newest `limit`; with `before` (a created_at) the page of up to `limit` (default 50)
+        messages older than it. has_more says whether older messages remain beyond those returned.
+        """
         try:
-            cb = self._chatboxes.get(conv_id)
-            if not cb:
+            cb = self._get_chatbox(conv_id)
+            if cb is None:
                 return self._err("chatbox not found; call get_or_create_chatbox first")
             if reload:
-                cb.reload()
-            return self._ok({"conv_id": conv_id, "messages": cb.get_history()})
+                # Keyset fetch of what arrived since the last load instead of the whole history
+                cb.fetch_newer()
+            if before is not None:
+                page_size = limit or 50
+                messages = cb.fetch_older(before_ts=before, limit=page_size)
+                has_more = len(messages) == page_size
+            else:
+                cb.ensure_loaded(limit)
+                messages = cb.get_history()
+                has_more = not cb.complete
+                if limit is not None and len(messages) > limit:
+                    messages, has_more = messages[-limit:], True
+            return self._ok({"conv_id": conv_id, "messages": messages, "has_more": has_more})
         except Exception as e:
             self.logger.exception("get_history failed")
             return self._err(str(e))
@@ -126,8 +454,8 @@ class IO:
         try:
             if not content or not content.strip():
                 return self._err("message is empty")
-            cb = self._chatboxes.get(conv_id)
-            if not cb:
+            cb = self._get_chatbox(conv_id)
+            if cb is None:
                 return self._err("chatbox not found; call get_or_create_chatbox first")
             row = cb.append_message(role=type or "user", content=content)
             if row is None:
@@ -137,35 +465,58 @@ class IO:
             self.logger.exception("post_user_message failed")
             return self._err(str(e))
 
+    async def _infer(self, message: str) -> List[Any]:
+        """(audit, attack) responses for message; the two agent calls run concurrently on worker threads."""
+        return await asyncio.gather(
+            asyncio.to_thread(self._audit_message, message) if self.auditor is not None and self._has_audit else _none(),
+            asyncio.to_thread(self._attack_message, message) if self.attacker is not None and self._has_attack else _none(),
+        )
+
     def infer_and_record(self, conv_id: int, message: str) -> Dict[str, Any]:
         """Run auditor/attacker on message and record results into chatbox."""
+        return _run_sync(self.infer_and_record_async(conv_id, message))
+
+    async def infer_and_record_async(self, conv_id: int, message: str) -> Dict[str, Any]:
+        """Async infer_and_record; the auditor and attacker run concurrently."""
         try:
-            cb = self._chatboxes.get(conv_id)
-            if not cb:
+            cb = await asyncio.to_thread(self._get_chatbox, conv_id)
+            if cb is None:
                 return self._err("chatbox not found; call get_or_create_chatbox first")
-            audit = self.auditor.audit(message) if hasattr(self.auditor, "audit") else None
-            attack = self.attacker.attack(message) if hasattr(self.attacker, "attack") else None
-            recorded = cb.record_inference(audit=audit, attack=attack)
+            audit, attack = await self._infer(message)
+            recorded = await asyncio.to_thread(cb.record_inference, audit=audit, attack=attack)
             return self._ok({"audit": recorded.get("audit"), "attack": recorded.get("attack")})
         except Exception as e:
-            self.logger.exception("infer_and_record failed")
+            self.logger.exception("infer_and_record_async failed")
             return self._err(str(e))
 
     def handle_incoming(self, conv_id: int, content: str, run_inference: bool = True) -> Dict[str, Any]:
         """End-to-end handling: append user message, optionally run agents, return results."""
-        try:
+        if not run_inference:
             post = self.post_user_message(conv_id, content)
-            if not post.get("ok"):
+            return self._ok({"posted": post["data"]}) if post["ok"] else post
+        return _run_sync(self.handle_incoming_async(conv_id, content))
+
+    async def handle_incoming_async(self, conv_id: int, content: str) -> Dict[str, Any]:
+        """handle_incoming with inference: the user message is persisted first, so the agents
+        only see saved messages; they then run concurrently and their replies are appended after it.
+        """
+        try:
+            if not content or not content.strip():
+                return self._err("message is empty")
+            cb = await asyncio.to_thread(self._get_chatbox, conv_id)
+            if cb is None:
+                return self._err("chatbox not found; call get_or_create_chatbox first")
+            post = await asyncio.to_thread(self.post_user_message, conv_id, content)
+            if not post["ok"]:
                 return post
-            if not run_inference:
-                return self._ok({"posted": post.get("data")})
-            infer = self.infer_and_record(conv_id, content)
-            if not infer.get("ok"):
-                return infer
-            return self._ok({"posted": post.get("data"), "inference": infer.get("data")})
+            audit, attack = await self._infer(content)
+            recorded = await asyncio.to_thread(cb.record_inference, audit=audit, attack=attack)
+            inference = {"audit": recorded.get("audit"), "attack": recorded.get("attack")}
+            return self._ok({"posted": post["data"], "inference": inference})
         except Exception as e:
-            self.logger.exception("handle_incoming failed")
+            self.logger.exception("handle_incoming_async failed")
             return self._err(str(e))
+
     def save_message(self, message: str, type: Optional[str] = None) -> Dict[str, Any]:
         """Persist a raw message to storage."""
         try:
@@ -177,49 +528,79 @@ class IO:
             self.logger.exception("save_message failed")
             return self._err(str(e))
 
+    def queue_message(self, message: str, type: Optional[str] = None) -> Dict[str, Any]:
+        """Hand a message to the background writer and return immediately.
+        Failures are logged and counted in status()["data"]["writes"]["failed"].
+        """
+        if not message or not message.strip():
+            return self._err("message is empty")
+        self._submit_write(message, type)
+        return self._ok({"queued": True})
+
     def process_message(self, message: str) -> Dict[str, Any]:
         """Run the message through AI agents (auditor and attacker)."""
+        return _run_sync(self.process_message_async(message))
+
+    async def process_message_async(self, message: str) -> Dict[str, Any]:
+        """Async process_message; the auditor and attacker run concurrently."""
         try:
-            audit_response = None
-            attack_response = None
-            if hasattr(self.auditor, "audit"):
-                audit_response = self.auditor.audit(message)
-            if hasattr(self.attacker, "attack"):
-                attack_response = self.attacker.attack(message)
+            audit_response, attack_response = await self._infer(message)
             data = {"audit": audit_response, "attack": attack_response}
             return self._ok(data)
         except Exception as e:
-            self.logger.exception("process_message failed")
+            self.logger.exception("process_message_async failed")
             return self._err(str(e))
 
     def input_message(self, message: str, type: Optional[str] = None) -> Dict[str, Any]:
         """High-level: save + process a message, return structured result.
+        data["saved"] is the stored Message row; a failed save returns an error result.
         Backwards-compatible function; prefer chatbox flow for conversations.
         """
         try:
-            save_res = self.save_message(message, type)
-            if not save_res.get("ok"):
-                return save_res
+            if not message or not message.strip():
+                return self._err("message is empty")
+            # The DB write happens on the writer thread while the agents run
+            saved = self._submit_write(message, type)
             proc_res = self.process_message(message)
-            if not proc_res.get("ok"):
+            row = saved.result()
+            if not proc_res["ok"]:
                 return proc_res
             combined = {
-                "saved": save_res.get("data"),
-                "inference": proc_res.get("data"),
+                "saved": row,
+                "inference": proc_res["data"],
             }
             return self._ok(combined)
         except Exception as e:
             self.logger.exception("input_message failed")
             return self._err(str(e))
 
+    async def input_message_async(self, message: str, type: Optional[str] = None) -> Dict[str, Any]:
+        """Async input_message: the DB write, auditor and attacker run concurrently,
+        so the call takes as long as the slowest of them instead of their sum.
+        data["saved"] is the stored Message row, as in input_message.
+        """
+        try:
+            if not message or not message.strip():
+                return self._err("message is empty")
+            row, (audit_response, attack_response) = await asyncio.gather(
+                asyncio.wrap_future(self._submit_write(message, type)),
+                self._infer(message),
+            )
+            return self._ok({
+                "saved": row,
+                "inference": {"audit": audit_response, "attack": attack_response},
+            })
+        except Exception as e:
+            self.logger.exception("input_message_async failed")
+            return self._err(str(e))
+
     def output_chatbox(self, message):
         return message
     
     def input_file(self, file: str, encoding: str = "utf-8") -> Dict[str, Any]:
         """Read a text file and process its content like a normal message."""
         try:
-            with open(file, "r", encoding=encoding) as f:
-                content = f.read()
+            content = _read_text(file, encoding)
             return self.input_message(content, type="file")
         except FileNotFoundError:
             return self._err("file not found")
@@ -227,6 +608,19 @@ class IO:
             self.logger.exception("input_file failed")
             return self._err(str(e))
 
+    async def input_file_async(self, file: str, encoding: str = "utf-8") -> Dict[str, Any]:
+        """Async input_file for use from async routes: the read runs on a worker thread
+        so a large file does not block the event loop.
+        """
+        try:
+            content = await asyncio.to_thread(_read_text, file, encoding)
+        except FileNotFoundError:
+            return self._err("file not found")
+        except Exception as e:
+            self.logger.exception("input_file_async failed")
+            return self._err(str(e))
+        return await self.input_message_async(content, type="file")
+
     # ------------------------
     # Projects / Documents (thin wrappers over Database)
     # ------------------------
@@ -257,250 +651,216 @@ class IO:
     # ------------------------
     # Audit pipeline (Law -> Attacker -> Auditor -> DB)
     # ------------------------
+    def _audit_calls(self, scenarios: List[Any], ent_ids: List[int], doc_ids: List[int], max_concurrent_agents: int = 8) -> List[Awaitable[Any]]:
+        """One awaitable Auditor response per scenario, in scenario order. The blocking Auditor calls
+        run on worker threads, at most max_concurrent_agents at a time to respect provider rate limits.
+        """
+        if self.auditor is None or not self._has_audit:
+            self.logger.warning("Auditor unavailable; generating mock audit responses")
+
+            return [_mock_audit(scenario) for scenario in scenarios]
+
+        gate = asyncio.Semaphore(max_concurrent_agents)
+
+        async def _audit_one(scenario: Any) -> Any:
+            async with gate:
+                return await asyncio.to_thread(_llm_call, self.auditor.audit, ent_ids=ent_ids, doc_ids=doc_ids, threat_scenario=scenario)
+
+        return [_audit_one(scenario) for scenario in scenarios]
+
+    async def _audit_scenarios(self, scenarios: List[Any], ent_ids: List[int], doc_ids: List[int], max_concurrent_agents: int = 8) -> List[Any]:
+        """Auditor responses for all scenarios, in scenario order, computed concurrently."""
+        return await asyncio.gather(*self._audit_calls(scenarios, ent_ids, doc_ids, max_concurrent_agents))
+
+    @staticmethod
+    def _issue_row(audit_id: int, scenario: Any, audit_resp: Any) -> Dict[str, Any]:
+        """Issue fields (create_issue keyword names) for one scenario and its Auditor response."""
+        law_used = scenario.get("law_citations", []) if isinstance(scenario, dict) else []
+
+        reasoning, evidence, qn = _normalize_audit(audit_resp)
+        return {
+            "audit_id": audit_id,
+            "issue_description": reasoning,
+            "ent_id": int(law_used[0]) if law_used else -1,
+            "status": "open",
+            "evidence": evidence,
+            "qn": qn,
+        }
+
+    def _persist_issue(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Issue, Conversation and first Message for one issue row; returns its issues_out entry."""
+        issue_id = self.database.create_issue(
+            audit_id=row["audit_id"],
+            issue_description=row["issue_description"],
+            ent_id=row["ent_id"],
+            status=row["status"],
+            evidence=row["evidence"],
+            qn=row["qn"],
+        )
+        conv_id = self.database.create_conversation(audit_id=row["audit_id"], issue_id=issue_id)
+        self.database.send_first_message(conv_id=conv_id, role="ai", content=row["qn"] or "Please provide clarification.")
+        return {
+            "issue_id": issue_id,
+            "conv_id": conv_id,
+            "reason": row["issue_description"],
+            "clarification_qn": row["qn"],
+        }
+
+    async def _resolve_ent_ids(self, doc_ids: List[int]) -> List[int]:
+        """Law → ent_ids (with graceful fallback)."""
+        if self.law is None or not self._has_law_audit:
+            self.logger.warning("Law unavailable; using mock ent_ids")
+            return await asyncio.to_thread(_mock_ent_ids, self.database)
+        ent_ids = await asyncio.to_thread(_llm_call, self.law.audit, doc_ids=doc_ids)
+        # If Law returns objects, attempt to map them to ent_id ints
+        if ent_ids and not isinstance(ent_ids[0], int):
+            try:
+                ent_ids = [int(getattr(x, "id", x.get("id"))) for x in ent_ids]  # type: ignore[attr-defined]
+            except Exception:
+                pass
+        return ent_ids
+
+    async def _resolve_scenarios(self, ent_ids: List[int], doc_ids: List[int], max_scenarios: int) -> List[Dict[str, Any]]:
+        """Attacker → scenarios (with graceful fallback)."""
+        if self.attacker is None or not self._has_run_attack:
+            self.logger.warning("Attacker unavailable; generating mock scenarios")
+            return _mock_scenarios(max_scenarios, ent_ids, doc_ids[0])
+        bundle = await asyncio.to_thread(_llm_call, self.attacker.run_attack, ent_ids=ent_ids, max_n=max_scenarios, prd_doc_id=doc_ids[0])
+        scenarios = (bundle or {}).get("scenarios", [])
+        if not scenarios:
+            self.logger.warning("Attacker returned no scenarios; falling back to mock scenarios")
+            scenarios = _mock_scenarios(max_scenarios, ent_ids, doc_ids[0])
+        return scenarios
+
+    async def _process_scenarios(self, audit_id: int, ent_ids: List[int], doc_ids: List[int], scenarios: List[Dict[str, Any]], max_concurrent_agents: int = 8) -> List[Dict[str, Any]]:
+        """Call Auditor for all scenarios concurrently, then persist Issue/Conversation/Message."""
+        responses = await self._audit_scenarios(scenarios, ent_ids, doc_ids, max_concurrent_agents)
+        issue_rows = [self._issue_row(audit_id, scenario, audit_resp) for scenario, audit_resp in zip(scenarios, responses)]
+        # Accumulate per-field columns; dicts are only built for the insert payloads and the final output
+        reasons = [row["issue_description"] for row in issue_rows]
+        qns = [row["qn"] for row in issue_rows]
+
+        # Three bulk inserts in total (issues, conversations, first messages) instead of three per scenario
+        issue_ids = await asyncio.to_thread(self.database.bulk_create_issues, issue_rows)
+        conv_ids = await asyncio.to_thread(
+            self.database.bulk_create_conversations,
+            [{"audit_id": audit_id, "issue_id": issue_id} for issue_id in issue_ids],
+        )
+        await asyncio.to_thread(
+            self.database.bulk_send_first_messages,
+            [{"conv_id": conv_id, "role": "ai", "content": qn or "Please provide clarification."} for conv_id, qn in zip(conv_ids, qns)],
+        )
+        return [
+            {"issue_id": issue_id, "conv_id": conv_id, "reason": reason, "clarification_qn": qn}
+            for issue_id, conv_id, reason, qn in zip(issue_ids, conv_ids, reasons, qns)
+        ]
+
+    async def _run_pipeline_core(self, project_id: int, max_scenarios: int, max_concurrent_agents: int, audit_id: Optional[int] = None) -> Dict[str, Any]:
+        """Shared body of both pipelines; creates the Audit row only when audit_id is None."""
+        if self.database is None:
+            return self._err("database is not initialized")
+        # 1. Collect document ids for project
+        doc_ids = await asyncio.to_thread(self.database.load_document_ids, project_id)
+        if not doc_ids:
+            return self._err("no documents found for project")
+
+        # 2. Law → ent_ids, 3. Attacker → scenarios
+        ent_ids = await self._resolve_ent_ids(doc_ids)
+        scenarios = await self._resolve_scenarios(ent_ids, doc_ids, max_scenarios)
+
+        # 4. Create Audit (unless running for an existing one)
+        if audit_id is None:
+            audit_id = await asyncio.to_thread(self.database.project_audit, project_id=project_id)
+
+        # 5. Auditor per scenario, then Issue/Conversation/Message rows
+        issues_out = await self._process_scenarios(audit_id, ent_ids, doc_ids, scenarios, max_concurrent_agents)
+
+        return self._ok({
+            "audit_id": audit_id,
+            "project_id": project_id,
+            "doc_ids": doc_ids,
+            "ent_ids": ent_ids,
+            "issues": issues_out,
+            "count": len(issues_out),
+        })
+
     def run_audit_pipeline(self, project_id: int, max_scenarios: int = 3) -> Dict[str, Any]:
+        """Synchronous entry point; see run_audit_pipeline_async."""
+        return _run_sync(self.run_audit_pipeline_async(project_id, max_scenarios=max_scenarios))
+
+    async def run_audit_pipeline_async(self, project_id: int, max_scenarios: int = 3, max_concurrent_agents: int = 8) -> Dict[str, Any]:
         """Run the full audit pipeline for a project.
         Steps:
         - Fetch project doc_ids
         - Use Law to retrieve relevant ent_ids
         - Use Attacker to generate scenarios (max_scenarios)
         - Create Audit row
-        - For each scenario, call Auditor, create Issue, Conversation, and seed a first message
+        - Call Auditor for every scenario concurrently (at most max_concurrent_agents at once)
+        - For each scenario, create Issue, Conversation, and seed a first message
 
         Returns { ok, data, error } with data summarizing audit_id, issues, and conversations.
         """
         try:
-            if self.database is None:
-                return self._err("database is not initialized")
-            # 1. Collect document ids for project
-            doc_ids = self.database.load_document_ids(project_id)
-            if not doc_ids:
-                return self._err("no documents found for project")
-
-            # 2. Law → ent_ids (with graceful fallback)
-            def _mock_ent_ids(k: int = 3) -> List[int]:
-                try:
-                    # Try to read a few ent_ids from Article_Entry as a best-effort
-                    rows = (
-                        self.database.supabase
-                        .table("Article_Entry")
-                        .select("ent_id")
-                        .limit(k)
-                        .execute()
-                    ).data or []
-                    ids = [int(r.get("ent_id")) for r in rows if r.get("ent_id") is not None]
-                    return ids or [1, 2, 3][:k]
-                except Exception:
-                    return [1, 2, 3][:k]
-
-            ent_ids: List[int]
-            if self.law is None or not hasattr(self.law, "audit"):
-                self.logger.warning("Law unavailable; using mock ent_ids")
-                ent_ids = _mock_ent_ids()
-            else:
-                ent_ids = self.law.audit(doc_ids=doc_ids)
-                # If Law returns objects, attempt to map them to ent_id ints
-                if ent_ids and not isinstance(ent_ids[0], int):
-                    try:
-                        ent_ids = [int(getattr(x, "id", x.get("id"))) for x in ent_ids]  # type: ignore[attr-defined]
-                    except Exception:
-                        pass
-
-            # 3. Attacker → scenarios (with graceful fallback)
-            def _mock_scenarios(max_n: int, ent_ids: List[int], prd_doc_id: int) -> List[Dict[str, Any]]:
-                out: List[Dict[str, Any]] = []
-                for i in range(max_n):
-                    out.append({
-                        "description": f"Scenario {i+1}: Potential misuse pathway referencing PRD {prd_doc_id} (Attack vector: unspecified)",
-                        "potential_violations": ["General Safety", "Privacy"],
-                        "jurisdictions": ["Generic"],
-                        "law_citations": ent_ids[:3] or [1],
-                        "rationale": "Generated by mock attacker due to unavailable LLM.",
-                        "prd_spans": [],
-                    })
-                return out
-
-            if self.attacker is None or not hasattr(self.attacker, "run_attack"):
-                self.logger.warning("Attacker unavailable; generating mock scenarios")
-                scenarios = _mock_scenarios(max_scenarios, ent_ids, doc_ids[0])
-            else:
-                bundle = self.attacker.run_attack(ent_ids=ent_ids, max_n=max_scenarios, prd_doc_id=doc_ids[0])
-                scenarios = (bundle or {}).get("scenarios", [])
-                if not scenarios:
-                    self.logger.warning("Attacker returned no scenarios; falling back to mock scenarios")
-                    scenarios = _mock_scenarios(max_scenarios, ent_ids, doc_ids[0])
-
-            # 4. Create Audit
-            audit_id = self.database.project_audit(project_id=project_id)
-
-            issues_out: List[Dict[str, Any]] = []
-
-            # 5. For each scenario, call Auditor and persist Issue/Conversation/Message
-            auditor_available = self.auditor is not None and hasattr(self.auditor, "audit")
-            for scenario in scenarios:
-                law_used = scenario.get("law_citations", []) if isinstance(scenario, dict) else []
-                if auditor_available:
-                    audit_resp = self.auditor.audit(ent_ids=ent_ids, doc_ids=doc_ids, threat_scenario=scenario)
-                else:
-                    self.logger.warning("Auditor unavailable; generating mock audit response")
-                    audit_resp = {
-                        "reasoning": f"Mock reasoning for scenario: {scenario.get('description', 'N/A')}",
-                        "evidence": None,  # Optional; when None, no highlights will render
-                        "clarification_question": "Can you provide more details about user consent and data flows?",
-                    }
-
-                # Normalize audit response to first item dict
-                first = None
-                if isinstance(audit_resp, list) and audit_resp:
-                    first = audit_resp[0]
-                elif isinstance(audit_resp, dict):
-                    first = audit_resp
-
-                reasoning = (first or {}).get("reasoning", "")
-                evidence = (first or {}).get("evidence")
-                clarification_qn = (first or {}).get("clarification_question", "")
-                ent_id_for_issue = int(law_used[0]) if law_used else -1
-
-                issue_id = self.database.create_issue(
-                    audit_id=audit_id,
-                    issue_description=reasoning,
-                    ent_id=ent_id_for_issue,
-                    status="open",
-                    evidence=evidence,
-                    qn=clarification_qn,
-                )
-                conv_id = self.database.create_conversation(audit_id=audit_id, issue_id=issue_id)
-                _ = self.database.send_first_message(conv_id=conv_id, role="ai", content=clarification_qn or "Please provide clarification.")
-
-                issues_out.append({
-                    "issue_id": issue_id,
-                    "conv_id": conv_id,
-                    "reason": reasoning,
-                    "clarification_qn": clarification_qn,
-                })
-
-            return self._ok({
-                "audit_id": audit_id,
-                "project_id": project_id,
-                "doc_ids": doc_ids,
-                "ent_ids": ent_ids,
-                "issues": issues_out,
-                "count": len(issues_out),
-            })
+            return await self._run_pipeline_core(project_id, max_scenarios, max_concurrent_agents)
         except Exception as e:
             self.logger.exception("run_audit_pipeline failed")
             return self._err(str(e))
 
-    def run_audit_pipeline_for_audit(self, audit_id: int, project_id: int, max_scenarios: int = 3) -> Dict[str, Any]:
-        """Run the audit pipeline but use an existing audit_id instead of creating a new one."""
+    async def run_audit_pipeline_stream(self, project_id: int, max_scenarios: int = 3, max_concurrent_agents: int = 8) -> AsyncGenerator[bytes, None]:
+        """run_audit_pipeline as NDJSON events: "started" (audit_id, doc_ids, ent_ids, scenario count),
+        then one "issue" per scenario as soon as its Auditor call returns and its rows are written,
+        then "done" (or "error"). Issues arrive in completion order, not scenario order.
+        """
+        tasks: List[asyncio.Task] = []
         try:
             if self.database is None:
-                return self._err("database is not initialized")
-            doc_ids = self.database.load_document_ids(project_id)
+                yield _event({"event": "error", "error": "database is not initialized"})
+                return
+            doc_ids = await asyncio.to_thread(self.database.load_document_ids, project_id)
             if not doc_ids:
-                return self._err("no documents found for project")
-
-            # Law → ent_ids (with graceful fallback)
-            def _mock_ent_ids(k: int = 3) -> List[int]:
-                try:
-                    rows = (
-                        self.database.supabase
-                        .table("Article_Entry")
-                        .select("ent_id")
-                        .limit(k)
-                        .execute()
-                    ).data or []
-                    ids = [int(r.get("ent_id")) for r in rows if r.get("ent_id") is not None]
-                    return ids or [1, 2, 3][:k]
-                except Exception:
-                    return [1, 2, 3][:k]
-
-            ent_ids: List[int]
-            if self.law is None or not hasattr(self.law, "audit"):
-                self.logger.warning("Law unavailable; using mock ent_ids")
-                ent_ids = _mock_ent_ids()
-            else:
-                ent_ids = self.law.audit(doc_ids=doc_ids)
-                if ent_ids and not isinstance(ent_ids[0], int):
-                    try:
-                        ent_ids = [int(getattr(x, "id", x.get("id"))) for x in ent_ids]  # type: ignore[attr-defined]
-                    except Exception:
-                        pass
-
-            # Attacker → scenarios (with graceful fallback)
-            def _mock_scenarios(max_n: int, ent_ids: List[int], prd_doc_id: int) -> List[Dict[str, Any]]:
-                out: List[Dict[str, Any]] = []
-                for i in range(max_n):
-                    out.append({
-                        "description": f"Scenario {i+1}: Potential misuse pathway referencing PRD {prd_doc_id} (Attack vector: unspecified)",
-                        "potential_violations": ["General Safety", "Privacy"],
-                        "jurisdictions": ["Generic"],
-                        "law_citations": ent_ids[:3] or [1],
-                        "rationale": "Generated by mock attacker due to unavailable LLM.",
-                        "prd_spans": [],
-                    })
-                return out
-
-            if self.attacker is None or not hasattr(self.attacker, "run_attack"):
-                self.logger.warning("Attacker unavailable; generating mock scenarios")
-                scenarios = _mock_scenarios(max_scenarios, ent_ids, doc_ids[0])
-            else:
-                bundle = self.attacker.run_attack(ent_ids=ent_ids, max_n=max_scenarios, prd_doc_id=doc_ids[0])
-                scenarios = (bundle or {}).get("scenarios", [])
-                if not scenarios:
-                    self.logger.warning("Attacker returned no scenarios; falling back to mock scenarios")
-                    scenarios = _mock_scenarios(max_scenarios, ent_ids, doc_ids[0])
-
-            issues_out: List[Dict[str, Any]] = []
-            auditor_available = self.auditor is not None and hasattr(self.auditor, "audit")
-            for scenario in scenarios:
-                law_used = scenario.get("law_citations", []) if isinstance(scenario, dict) else []
-                if auditor_available:
-                    audit_resp = self.auditor.audit(ent_ids=ent_ids, doc_ids=doc_ids, threat_scenario=scenario)
-                else:
-                    self.logger.warning("Auditor unavailable; generating mock audit response")
-                    audit_resp = {
-                        "reasoning": f"Mock reasoning for scenario: {scenario.get('description', 'N/A')}",
-                        "evidence": None,
-                        "clarification_question": "Can you provide more details about user consent and data flows?",
-                    }
-
-                first = None
-                if isinstance(audit_resp, list) and audit_resp:
-                    first = audit_resp[0]
-                elif isinstance(audit_resp, dict):
-                    first = audit_resp
-
-                reasoning = (first or {}).get("reasoning", "")
-                evidence = (first or {}).get("evidence")
-                clarification_qn = (first or {}).get("clarification_question", "")
-                ent_id_for_issue = int(law_used[0]) if law_used else -1
-
-                issue_id = self.database.create_issue(
-                    audit_id=audit_id,
-                    issue_description=reasoning,
-                    ent_id=ent_id_for_issue,
-                    status="open",
-                    evidence=evidence,
-                    qn=clarification_qn,
-                )
-                conv_id = self.database.create_conversation(audit_id=audit_id, issue_id=issue_id)
-                _ = self.database.send_first_message(conv_id=conv_id, role="ai", content=clarification_qn or "Please provide clarification.")
-
-                issues_out.append({
-                    "issue_id": issue_id,
-                    "conv_id": conv_id,
-                    "reason": reasoning,
-                    "clarification_qn": clarification_qn,
-                })
-
-            return self._ok({
+                yield _event({"event": "error", "error": "no documents found for project"})
+                return
+            ent_ids = await self._resolve_ent_ids(doc_ids)
+            scenarios = await self._resolve_scenarios(ent_ids, doc_ids, max_scenarios)
+            audit_id = await asyncio.to_thread(self.database.project_audit, project_id=project_id)
+            yield _event({
+                "event": "started",
                 "audit_id": audit_id,
                 "project_id": project_id,
                 "doc_ids": doc_ids,
                 "ent_ids": ent_ids,
-                "issues": issues_out,
-                "count": len(issues_out),
+                "scenarios": len(scenarios),
             })
+
+            async def _indexed(i: int, call: Awaitable[Any]):
+                return i, await call
+
+            calls = self._audit_calls(scenarios, ent_ids, doc_ids, max_concurrent_agents)
+            tasks = [asyncio.create_task(_indexed(i, call)) for i, call in enumerate(calls)]
+            count = 0
+            for next_done in asyncio.as_completed(tasks):
+                i, audit_resp = await next_done
+                issue = await asyncio.to_thread(self._persist_issue, self._issue_row(audit_id, scenarios[i], audit_resp))
+                count += 1
+                yield _event({"event": "issue", **issue})
+            yield _event({"event": "done", "audit_id": audit_id, "count": count})
+        except Exception as e:
+            self.logger.exception("run_audit_pipeline_stream failed")
+            yield _event({"event": "error", "error": str(e)})
+        finally:
+            # Client went away (generator closed) or a call failed: stop the outstanding
+            # scenarios so nothing keeps writing Issue rows for an abandoned stream
+            for task in tasks:
+                task.cancel()
+
+    def run_audit_pipeline_for_audit(self, audit_id: int, project_id: int, max_scenarios: int = 3) -> Dict[str, Any]:
+        """Synchronous entry point; see run_audit_pipeline_for_audit_async."""
+        return _run_sync(self.run_audit_pipeline_for_audit_async(audit_id, project_id, max_scenarios=max_scenarios))
+
+    async def run_audit_pipeline_for_audit_async(self, audit_id: int, project_id: int, max_scenarios: int = 3, max_concurrent_agents: int = 8) -> Dict[str, Any]:
+        """Run the audit pipeline but use an existing audit_id instead of creating a new one."""
+        try:
+            return await self._run_pipeline_core(project_id, max_scenarios, max_concurrent_agents, audit_id=audit_id)
         except Exception as e:
             self.logger.exception("run_audit_pipeline_for_audit failed")
             return self._err(str(e))
@@ -514,7 +874,7 @@ class IO:
             except Exception as _:
                 pass
             res = self.run_audit_pipeline_for_audit(audit_id=audit_id, project_id=project_id, max_scenarios=max_scenarios)
-            if res.get("ok"):
+            if res["ok"]:
                 try:
                     self.database.update_audit_status(audit_id, "completed")
                 except Exception:
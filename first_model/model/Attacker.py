@@ -1,12 +1,17 @@
 import os
-import json
 import re
-import anthropic
-from supabase import create_client, Client
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+import orjson
+from cachetools import TTLCache
+from supabase import Client
 from pydantic import BaseModel, Field, field_validator, ValidationError
 from typing import List, Optional
 from dotenv import load_dotenv
 from pathlib import Path
+from first_model.database.Database import get_client, get_document_text
+from first_model.model.Model import get_anthropic_client
 
 # Load environment variables from a .env file
 load_dotenv(dotenv_path="../../secrets/.env.dev")
@@ -14,6 +19,34 @@ load_dotenv(dotenv_path="../../secrets/.env.dev")
 PAREN_RE = re.compile(r"\(Attack vector:\s*.+\s*\)$")
 PLACEHOLDER_PAREN = "(Attack vector: unspecified)"
 
+# Rendered law-entry bullets for run_attack; entries only change on re-ingest, so they live longer
+# than the Database read caches. Documents are read through Database.get_document_text, whose
+# cache save_document invalidates.
+_law_entry_cache = TTLCache(maxsize=20000, ttl=300)
+_cache_lock = threading.Lock()
+
+# run_attack calls currently talking to Claude, by request key; identical concurrent calls wait on
+# the first one's Future instead of sending their own request. This is single-flight, not
+# micro-batching: merging different callers into one prompt would change the attack prompt and
+# its one-bundle-per-response output contract, so distinct requests are still sent separately
+_inflight: dict = {}
+_inflight_lock = threading.Lock()
+
+def _render_law_entry(r: dict) -> str:
+    """One get_law_context bullet for an Article_Entry row."""
+    art_num, kind, word = r.get("art_num"), r.get("type"), r.get("word")
+    fields = [f"- ent_id={r.get('ent_id')}", f"law={r.get('belongs_to') or 'N/A'}"]
+    if art_num:
+        fields.append(f"article={art_num}")
+    if kind:
+        fields.append(f"type={kind}")
+        if word and kind.lower() == "definition":
+            fields.append(f"defines={word}")
+    contents = (r.get("contents") or "").strip().replace("\n", " ")
+    if len(contents) > 800:  # safety trim to keep prompt size under control
+        contents = contents[:800] + "…"
+    return " | ".join(fields) + "\n  " + contents
+
 class AttackScenario(BaseModel):
     description: str  # must end with "(Attack vector: … | Potential harm: …)"
     potential_violations: List[str]
@@ -46,30 +79,90 @@ class AttackScenario(BaseModel):
 class AuditBundle(BaseModel):
     scenarios: List[AttackScenario]
 
+_SCENARIOS_OPEN = re.compile(r'"scenarios"\s*:\s*\[')
+
+class _ScenarioScanner:
+    """
+    Picks each object out of the "scenarios" array of a streamed reply as soon as its
+    closing brace arrives, tracking nesting and string literals character by character.
+    """
+
+    def __init__(self):
+        self._head = ""
+        self._obj: List[str] = []
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self.started = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """JSON text of every scenario object completed by this chunk."""
+        if self.closed:
+            return []
+        if not self.started:
+            self._head += chunk
+            m = _SCENARIOS_OPEN.search(self._head)
+            if not m:
+                return []
+            self.started = True
+            chunk, self._head = self._head[m.end():], ""
+        found = []
+        obj = self._obj
+        for ch in chunk:
+            if self._depth:
+                obj.append(ch)
+                if self._in_str:
+                    if self._esc:
+                        self._esc = False
+                    elif ch == "\\":
+                        self._esc = True
+                    elif ch == '"':
+                        self._in_str = False
+                elif ch == '"':
+                    self._in_str = True
+                elif ch == "{" or ch == "[":
+                    self._depth += 1
+                elif ch == "}" or ch == "]":
+                    self._depth -= 1
+                    if not self._depth:
+                        found.append("".join(obj))
+                        obj.clear()
+            elif ch == "{":
+                self._depth = 1
+                obj.append(ch)
+            elif ch == "]":
+                self.closed = True
+                break
+        return found
+
 class Attacker():
     """
     Generates attack scenarios by analyzing a product requirements document (PRD)
     against a set of legal contexts.
     """
-    _FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
-
     def __init__(self):
         """Initializes API clients and other resources."""
         # --- LLM and Database Client Setup ---
         anthropic_key = os.environ.get("ANTHROPIC_API_KEY")
         if not anthropic_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set.")
-        self.llm_client = anthropic.Anthropic(api_key=anthropic_key)
+        self.llm_client = get_anthropic_client()
 
         url: str = os.environ.get("SUPABASE_URL")
         key: str = os.environ.get("SUPABASE_KEY")
         if not url or not key:
             raise ValueError("Supabase URL or Key environment variables not set.")
-        self.supabase: Client = create_client(url, key)
+        self.supabase: Client = get_client()
     @staticmethod
     def _strip_md_fences(s: str) -> str:
-        # Remove a single Markdown code-fence block if the model added one
-        return Attacker._FENCE_RE.sub("", s).strip()
+        # Remove a single Markdown code-fence block if the model added one; plain JSON skips straight through
+        s = s.strip()
+        if s.startswith("```"):
+            s = s[3:].removeprefix("json")
+        if s.endswith("```"):
+            s = s[:-3]
+        return s.strip()
 
     @staticmethod
     def _load_json_or_explain(txt: str) -> dict:
@@ -79,12 +172,13 @@ class Attacker():
         """
         clean = Attacker._strip_md_fences(txt)
         try:
-            return json.loads(clean)
-        except json.JSONDecodeError as e:
-            m = re.search(r"\{.*\}\s*$", clean, flags=re.DOTALL)
-            if m:
+            return orjson.loads(clean)
+        except orjson.JSONDecodeError as e:
+            # Fall back to the span from the first "{" to a closing "}" at the very end
+            start = clean.find("{")
+            if start != -1 and clean.endswith("}"):
                 try:
-                    return json.loads(m.group(0))
+                    return orjson.loads(clean[start:])
                 except Exception:
                     pass
             preview = clean[:800]
@@ -98,7 +192,7 @@ class Attacker():
             bundle = AuditBundle.model_validate(data)
         except ValidationError as ve:
             keys = list(data.keys()) if isinstance(data, dict) else type(data).__name__
-            raw_preview = json.dumps(data, ensure_ascii=False)[:800]
+            raw_preview = orjson.dumps(data).decode()[:800]
             raise RuntimeError(
                 "Claude output failed schema validation.\n"
                 f"- Top-level keys: {keys}\n"
@@ -117,40 +211,37 @@ class Attacker():
         """
         Fetch compact, traceable legal context from Supabase.
         Format: one bullet per row with ent_id, law, article/type/definition, and trimmed contents.
+        Bullets are cached per (table, ent_id), so only entries not seen recently are fetched.
         """
         if not ent_ids:
             return "NO_CONTEXT"
 
-        res = (
-            self.supabase.table(table)
-            .select("ent_id, art_num, type, belongs_to, contents, word")
-            .in_("ent_id", ent_ids)
-            .execute()
-        )
+        ids = sorted(set(ent_ids))
+        with _cache_lock:
+            entries = {i: _law_entry_cache.get((table, i)) for i in ids}
+        missing = [i for i, text in entries.items() if text is None]
 
-        rows = res.data or []
-        if not rows:
-            return "NO_CONTEXT"
+        if missing:
+            res = (
+                self.supabase.table(table)
+                .select("ent_id, art_num, type, belongs_to, contents, word")
+                .in_("ent_id", missing)
+                .execute()
+            )
+            fetched = {r.get("ent_id"): _render_law_entry(r) for r in res.data or []}
+            with _cache_lock:
+                for ent_id, text in fetched.items():
+                    _law_entry_cache[(table, ent_id)] = text
+            entries.update(fetched)
 
-        out: List[str] = []
-        for r in rows:
-            header = f"- ent_id={r.get('ent_id')} | law={r.get('belongs_to') or 'N/A'}"
-            if r.get("art_num"):
-                header += f" | article={r.get('art_num')}"
-            if r.get("type"):
-                header += f" | type={r.get('type')}"
-            if (r.get("type") or "").lower() == "definition" and r.get("word"):
-                header += f" | defines={r.get('word')}"
-            contents = (r.get("contents") or "").strip().replace("\n", " ")
-            if len(contents) > 800:  # safety trim to keep prompt size under control
-                contents = contents[:800] + "…"
-            out.append(header + "\n  " + contents)
-
-        return "\n".join(out)
+        out = [text for text in entries.values() if text is not None]
+        return "\n".join(out) if out else "NO_CONTEXT"
 
     # ------------------- Prompt Helpers -------------------
     @staticmethod
+    @lru_cache(maxsize=8)
     def load_prompt_template(path: str = None) -> str:
+        # Read once per path; the template file only changes with a deploy
         if path is None:
             # Always resolve relative to this file
             path = Path(__file__).parent / "prompt_template" / "attacker_prompt.txt"
@@ -170,32 +261,37 @@ class Attacker():
     ) -> AuditBundle:
         """
         Run an attack analysis: fetch PRD doc, call Claude, parse+validate JSON.
-        Returns an AuditBundle Pydantic model.
+        Returns the validated AuditBundle as a dict. Concurrent calls with the same
+        arguments share one Claude request; each caller still gets its own dict.
         """
+        key = (prd_doc_id, tdd_doc_id, max_n, tuple(sorted(ent_ids)))
+        with _inflight_lock:
+            pending = _inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = _inflight[key] = Future()
+        if not leader:
+            return pending.result().model_dump()
+        try:
+            bundle = self._run_attack(ent_ids, max_n=max_n, prd_doc_id=prd_doc_id, tdd_doc_id=tdd_doc_id)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(bundle)
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+        return bundle.model_dump()
+
+    def _run_attack(self, ent_ids: List[int], *, max_n: int, prd_doc_id: int, tdd_doc_id: Optional[int]) -> AuditBundle:
         # 1. Fetch PRD doc with spans
-        doc_rows = (
-            self.supabase.table("Document")
-            .select("content, content_span")
-            .eq("doc_id", prd_doc_id)
-            .limit(1)
-            .execute()
-            .data
-        )
-        prd_text = (doc_rows[0].get("content") if doc_rows else "") or ""
-        prd_span = (doc_rows[0].get("content_span") if doc_rows else "") or ""
+        prd_text, prd_span = get_document_text(prd_doc_id)
 
         tdd_text = ""
 
         if tdd_doc_id is not None:
-            tdd_rows = (
-                self.supabase.table("Document")
-                .select("content")
-                .eq("doc_id", tdd_doc_id)
-                .limit(1)
-                .execute()
-                .data
-            )
-            tdd_text = (tdd_rows[0].get("content") if tdd_rows else "") or ""
+            tdd_text = get_document_text(tdd_doc_id)[0]
 
         # 2. Build law context from ent_ids
         relevant_law = self.get_law_context(ent_ids)
@@ -210,21 +306,35 @@ class Attacker():
             relevant_law=relevant_law,
         )
 
-        # 4. Call Claude
-        resp = self.llm_client.messages.create(
+        # 4. Call Claude, validating each scenario while the rest of the reply is still streaming
+        scanner = _ScenarioScanner()
+        scenarios: Optional[List[AttackScenario]] = []
+        parts: List[str] = []
+        with self.llm_client.messages.stream(
             model="claude-opus-4-1-20250805",
             max_tokens=4000,
             messages=[{"role": "user", "content": final_prompt}],
-        )
-
-        if not resp.content or not getattr(resp.content[0], "text", "").strip():
+        ) as stream:
+            for text in stream.text_stream:
+                parts.append(text)
+                if scenarios is None:
+                    continue
+                for obj in scanner.feed(text):
+                    try:
+                        scenarios.append(AttackScenario.model_validate_json(obj))
+                    except ValidationError:
+                        scenarios = None  # the full parse below reports it
+                        break
+
+        raw_text = "".join(parts)
+        if not raw_text.strip():
             raise RuntimeError("Claude returned an empty response body.")
+        if scanner.closed and scenarios is not None and len(scenarios) == max_n:
+            return AuditBundle(scenarios=scenarios)
 
-        # 4. Parse + validate
-        raw_text = resp.content[0].text
+        # 5. Whole-reply parse + validate, with the detailed error explanations
         data = self._load_json_or_explain(raw_text)
-        bundle = self._validate_bundle_or_explain(data, max_n)
-        return bundle.model_dump()
+        return self._validate_bundle_or_explain(data, max_n)
 
 
 
@@ -2,11 +2,12 @@ import os
 import json
 import re
 import anthropic
-from supabase import create_client, Client
+from supabase import Client
 from pydantic import BaseModel, Field, field_validator, ValidationError
 from typing import List, Dict, Tuple, Optional
 from dotenv import load_dotenv
 from pathlib import Path
+from first_model.database.Database import get_client
 
 # ★ NEW: embedding/rerank deps
 import numpy as np
@@ -89,7 +90,7 @@ class Attacker:
         key: str = os.environ.get("SUPABASE_KEY")
         if not url or not key:
             raise ValueError("Supabase URL or Key environment variables not set.")
-        self.supabase: Client = create_client(url, key)
+        self.supabase: Client = get_client()
 
         # ★ NEW: Cohere (optional) for reranking
         self._co = None
@@ -3,7 +3,8 @@ import json
 import torch
 from typing import List, Optional, Dict, Union
 from anthropic import Anthropic
-from supabase import create_client, Client
+from supabase import Client
+from first_model.database.Database import get_client
 from dotenv import load_dotenv
 import vecs
 import re
@@ -16,9 +17,7 @@ class Chat():
         self.llm_client = Anthropic(api_key=anthropic_key)
 
         # --- Database Client Setup ---
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        self.supabase: Client = create_client(url, key)
+        self.supabase: Client = get_client()
 
     ### --- UPDATED ADJUDICATOR ORCHESTRATOR --- ###
     def adjudicate(self, issue_id: int) -> Dict:
@@ -1,40 +1,156 @@
+import asyncio
+import atexit
+import hashlib
 import logging
+import sqlite3
+import threading
+import time
+import anthropic
 from google import genai
 from dotenv import load_dotenv
 import os
 
+from first_model.model.SemanticCache import SemanticCache, remote_embedder
+
+# Load secrets once at import; Model instances only read the cached keys
+load_dotenv(f"{__file__}/../../secrets/.env.dev")
+_ANTHROPIC_KEY = os.environ.get("ANTHROPIC_API_KEY")
+_GEMINI_KEY = os.environ.get("GEMINI_API_KEY")
+
+_ANTHROPIC = None
+_ANTHROPIC_LOCK = threading.Lock()
+
+def get_anthropic_client():
+    """Process-wide Anthropic client. Its HTTP/2 keep-alive pool is shared by every agent, so concurrent
+    calls multiplex over warm connections instead of each client paying its own TCP+TLS handshakes.
+    SDK retries are off: agent calls are retried by IO's tenacity backoff, and stacking the two
+    multiplied attempts. Callers without an outer retry use .with_options(max_retries=...).
+    """
+    global _ANTHROPIC
+    if _ANTHROPIC is None:
+        with _ANTHROPIC_LOCK:
+            if _ANTHROPIC is None:
+                _ANTHROPIC = anthropic.Anthropic(
+                    api_key=os.environ.get("ANTHROPIC_API_KEY") or _ANTHROPIC_KEY,
+                    http_client=anthropic.DefaultHttpxClient(http2=True),
+                    max_retries=0,
+                )
+    return _ANTHROPIC
+
+# Model-name prefix -> (API key, sync client factory, async client factory or None)
+PROVIDERS = {
+    "claude": (
+        _ANTHROPIC_KEY,
+        # Model has no retry of its own, so keep the SDK default here (same connection pool)
+        lambda key, model: get_anthropic_client().with_options(max_retries=2),
+        lambda key, model: anthropic.AsyncAnthropic(api_key=key),
+    ),
+    "gemini": (
+        _GEMINI_KEY,
+        lambda key, model: genai.GenerativeModel(model, api_key=key),
+        None,
+    ),
+}
+
+# Optional on-disk cache of LLM responses keyed by (model, max_tokens, system, content), for dev and
+# test runs that replay the same prompts. Off unless LLM_CACHE=1; entries expire after LLM_CACHE_TTL
+# seconds and only the newest LLM_CACHE_MAX_ROWS are kept. Responses are stored as JSON, not pickles.
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "0") == "1"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "./.llm_cache.db")
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ROWS = int(os.environ.get("LLM_CACHE_MAX_ROWS", "10000"))
+_cache_conn = None
+_cache_lock = threading.Lock()
+
+def _cache():
+    global _cache_conn
+    if _cache_conn is None:
+        _cache_conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+        _cache_conn.execute(
+            "create table if not exists llm_response_cache(key text primary key, response text, created_at int)"
+        )
+    return _cache_conn
+
+def _cache_get(key):
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        row = _cache().execute(
+            "select response from llm_response_cache where key = ? and created_at >= ?",
+            (key, int(time.time()) - LLM_CACHE_TTL),
+        ).fetchone()
+    return anthropic.types.Message.model_validate_json(row[0]) if row else None
+
+def _cache_put(key, response):
+    if not LLM_CACHE_ENABLED:
+        return
+    now = int(time.time())
+    with _cache_lock:
+        conn = _cache()
+        conn.execute(
+            "insert or replace into llm_response_cache(key, response, created_at) values (?, ?, ?)",
+            (key, response.model_dump_json(), now),
+        )
+        # Drop expired rows and everything beyond the newest LLM_CACHE_MAX_ROWS
+        conn.execute("delete from llm_response_cache where created_at < ?", (now - LLM_CACHE_TTL,))
+        conn.execute(
+            "delete from llm_response_cache where key in "
+            "(select key from llm_response_cache order by created_at desc, rowid desc limit -1 offset ?)",
+            (LLM_CACHE_MAX_ROWS,),
+        )
+        conn.commit()
+
+# Optional semantic cache for near-duplicate prompts, consulted after an exact-match miss. Off unless
+# SEMANTIC_CACHE=1; prompts are embedded by the embedding server at EMBEDDING_SERVER_URL, and hits
+# are only taken within the same (model, max_tokens, system). Saved to SEMANTIC_CACHE_PATH on exit
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_PATH = os.environ.get("SEMANTIC_CACHE_PATH", "./.semantic_cache.npz")
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MODEL = os.environ.get("SEMANTIC_CACHE_MODEL", "BAAI/bge-small-en-v1.5")
+_semantic = None
+_semantic_lock = threading.Lock()
+
+def _default_semantic_cache():
+    """Process-wide SemanticCache when SEMANTIC_CACHE=1 (None otherwise)."""
+    global _semantic
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    with _semantic_lock:
+        if _semantic is None:
+            url = os.environ.get("EMBEDDING_SERVER_URL")
+            if not url:
+                raise ValueError("SEMANTIC_CACHE=1 needs EMBEDDING_SERVER_URL")
+            _semantic = SemanticCache(
+                remote_embedder(url, SEMANTIC_CACHE_MODEL),
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                path=SEMANTIC_CACHE_PATH,
+            )
+            atexit.register(_semantic.save)
+    return _semantic
+
 class Model:
-    def __init__(self, database, model = "Claude Sonnet 4"):
+    def __init__(self, database, model = "Claude Sonnet 4", semantic_cache = None):
         self.init_logger()
         
         self.logger.info(f"Initializing Model with {model}")
 
         self.database = database
+        # Optional SemanticCache consulted after an exact-match cache miss; the shared one when SEMANTIC_CACHE=1
+        self.semantic_cache = semantic_cache if semantic_cache is not None else _default_semantic_cache()
 
         self.model = model
-        load_dotenv(f"{__file__}/../../secrets/.env.dev")
-        self.logger.debug("Environment variables loaded")
-        
-        match self.model:
-            case model if model.lower().startswith("claude"):
-                self.key = os.environ.get("ANTHROPIC_API_KEY")
-                self.logger.debug("Using Anthropic API key")
-            case model if model.lower().startswith("gemini"):
-                self.key = os.environ.get("GEMINI_API_KEY")
-                self.logger.debug("Using Gemini API key")
-            case _:
-                self.logger.error(f"Unsupported model: {self.model}")
-                raise ValueError(f"Unsupported model: {self.model}")
+
+        name = self.model.lower()
+        provider = next((prefix for prefix in PROVIDERS if name.startswith(prefix)), None)
+        if provider is None:
+            self.logger.error(f"Unsupported model: {self.model}")
+            raise ValueError(f"Unsupported model: {self.model}")
+        self.key, client_factory, async_factory = PROVIDERS[provider]
+        self.logger.debug(f"Using {provider} API key")
 
         self.logger.info("Initializing client")
-        if self.model.lower().startswith("gemini"):
-            self.client = genai.GenerativeModel(self.model, api_key=self.key)
-        elif self.model.lower().startswith("claude"):
-            # Placeholder for Anthropic client initialization, replace with actual Anthropic API usage
-            import anthropic
-            self.client = anthropic.Anthropic(api_key=self.key)
-        else:
-            self.client = None
+        self.client = client_factory(self.key, self.model)
+        self.async_client = async_factory(self.key, self.model) if async_factory else None
         self.logger.info("Model initialization complete")
 
     def init_logger(self):
@@ -49,14 +165,92 @@ class Model:
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
 
-    def create_message(self, content, token = 1024):
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=token,
-                messages=[
-                    {"role": "user", "content": content}
-                ]
-            )
+    def _cache_key(self, content, token, system = None):
+        return hashlib.sha256(f"{self.model}|{token}|{system or ''}|{content}".encode()).hexdigest()
+
+    def _semantic_scope(self, token, system = None):
+        # Near-duplicate hits only count under the same model, token budget and system prompt
+        return hashlib.sha256(f"{self.model}|{token}|{system or ''}".encode()).hexdigest()
+
+    def _request_kwargs(self, content, token, system = None):
+        kwargs = {
+            "model": self.model,
+            "max_tokens": token,
+            "messages": [
+                {"role": "user", "content": content}
+            ],
+        }
+        if system:
+            # Static system prompt marked for Anthropic prompt caching; keep it byte-stable between calls
+            kwargs["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return kwargs
+
+    def create_message(self, content, token = 1024, use_cache = True, system = None):
+            """Send a single user message. With LLM_CACHE=1, identical (model, token, system, content) calls are served from the local cache.
+            A `system` prompt is sent as an ephemeral cache_control block so Anthropic reuses its prefix.
+            """
+            key = self._cache_key(content, token, system)
+            if use_cache:
+                cached = _cache_get(key)
+                if cached is not None:
+                    self.logger.debug("LLM cache hit")
+                    return cached
+            vec = None
+            if use_cache and self.semantic_cache is not None:
+                scope = self._semantic_scope(token, system)
+                vec = self.semantic_cache.embed(content)
+                cached = self.semantic_cache.lookup(scope, vec)
+                if cached is not None:
+                    self.logger.debug("LLM semantic cache hit")
+                    return anthropic.types.Message.model_validate_json(cached)
+            response = self.client.messages.create(**self._request_kwargs(content, token, system))
+            if use_cache:
+                _cache_put(key, response)
+                if vec is not None:
+                    self.semantic_cache.add(scope, vec, response.model_dump_json())
             return response
-        
-    
+
+    def stream_message(self, content, token = 1024, use_cache = True, system = None):
+        """Yield the reply text as it is generated, so callers can print or parse before it finishes.
+        The final message is cached like create_message; use "".join(...) for the full text.
+        """
+        key = self._cache_key(content, token, system)
+        if use_cache:
+            cached = _cache_get(key)
+            if cached is not None:
+                self.logger.debug("LLM cache hit")
+                yield "".join(block.text for block in cached.content if block.type == "text")
+                return
+        with self.client.messages.stream(**self._request_kwargs(content, token, system)) as stream:
+            for text in stream.text_stream:
+                yield text
+            response = stream.get_final_message()
+        if use_cache:
+            _cache_put(key, response)
+
+    async def acreate_message(self, content, token = 1024, use_cache = True, system = None):
+        """Async counterpart of create_message so several agents can await the LLM concurrently."""
+        if self.async_client is None:
+            raise ValueError(f"Async client not available for model: {self.model}")
+        key = self._cache_key(content, token, system)
+        if use_cache:
+            cached = _cache_get(key)
+            if cached is not None:
+                self.logger.debug("LLM cache hit")
+                return cached
+        vec = None
+        if use_cache and self.semantic_cache is not None:
+            scope = self._semantic_scope(token, system)
+            # The embedding request is blocking I/O; keep it off the event loop
+            vec = await asyncio.to_thread(self.semantic_cache.embed, content)
+            cached = self.semantic_cache.lookup(scope, vec)
+            if cached is not None:
+                self.logger.debug("LLM semantic cache hit")
+                return anthropic.types.Message.model_validate_json(cached)
+        response = await self.async_client.messages.create(**self._request_kwargs(content, token, system))
+        if use_cache:
+            _cache_put(key, response)
+            if vec is not None:
+                self.semantic_cache.add(scope, vec, response.model_dump_json())
+        return response
+
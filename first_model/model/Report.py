@@ -3,7 +3,8 @@ import json
 import torch
 from typing import List, Optional, Dict, Union
 from anthropic import Anthropic
-from supabase import create_client, Client
+from supabase import Client
+from first_model.database.Database import get_client
 from dotenv import load_dotenv
 import vecs
 import re
@@ -18,9 +19,7 @@ class Report():
         self.llm_client = Anthropic(api_key=anthropic_key)
 
         # --- Database Client Setup ---
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        self.supabase: Client = create_client(url, key)
+        self.supabase: Client = get_client()
 
     def generate(self, audit_id: int) -> str:
         """Orchestrates the generation of the final, executive-ready audit report."""
@@ -0,0 +1,87 @@
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+import orjson
+
+
+class SemanticCache:
+    """
+    Embedding-keyed response cache for near-duplicate prompts.
+
+    A lookup embeds the prompt and returns the stored response of the most
+    similar earlier prompt when the cosine similarity clears `threshold`.
+    Entries are partitioned by scope (Model uses model, system prompt and
+    token budget), so a prompt only ever matches prompts sent under the same
+    settings. Vectors are kept L2-normalised in one matrix per scope, so a
+    lookup is a single matrix-vector product.
+
+    Payloads are strings (Model stores response.model_dump_json()) and are
+    persisted with the vectors in an .npz file, read back without pickle.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], Sequence[float]], threshold: float = 0.95, path: Optional[str] = None):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.path = Path(path) if path else None
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._payloads: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            self.load()
+
+    def embed(self, text: str) -> np.ndarray:
+        vec = np.asarray(self.embed_fn(text), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, scope: str, vec: np.ndarray) -> Optional[str]:
+        """Return the cached payload for the prompt in `scope` closest to `vec` (from embed), or None below the threshold."""
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            if vectors is None:
+                return None
+            scores = vectors @ vec
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._payloads[scope][best]
+        return None
+
+    def add(self, scope: str, vec: np.ndarray, payload: str) -> None:
+        vec = vec[None, :]
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            self._vectors[scope] = vec if vectors is None else np.vstack([vectors, vec])
+            self._payloads.setdefault(scope, []).append(payload)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            scopes = list(self._vectors)
+            arrays = {f"v{i}": self._vectors[scope] for i, scope in enumerate(scopes)}
+            meta = orjson.dumps({"scopes": scopes, "payloads": [self._payloads[scope] for scope in scopes]}).decode()
+        with open(self.path, "wb") as f:
+            np.savez(f, meta=np.array(meta), **arrays)
+
+    def load(self) -> None:
+        with np.load(self.path, allow_pickle=False) as data:
+            meta = orjson.loads(str(data["meta"]))
+            vectors = {scope: data[f"v{i}"] for i, scope in enumerate(meta["scopes"])}
+        with self._lock:
+            self._vectors = vectors
+            self._payloads = dict(zip(meta["scopes"], meta["payloads"]))
+
+
+def remote_embedder(base_url: str, model: str, timeout: float = 30.0) -> Callable[[str], List[float]]:
+    """embed_fn backed by an OpenAI-compatible /embeddings server (Infinity / TEI)."""
+    http = httpx.Client(base_url=base_url, timeout=timeout)
+
+    def embed(text: str) -> List[float]:
+        response = http.post("/embeddings", json={"model": model, "input": [text]})
+        response.raise_for_status()
+        return response.json()["data"][0]["embedding"]
+
+    return embed
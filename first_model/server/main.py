@@ -6,7 +6,8 @@ import json
 # database = Database()
 lawyer = Law()
 attacker = Attacker() 
-auditor = Auditor()
+# Called without IO's retry wrapper, so the SDK retries transient errors itself
+auditor = Auditor(max_retries=2)
 
 def audit_project(project_id: int, database, bill="All"):
     doc_ids= database.load_document_ids(project_id=project_id)
@@ -1,5 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Literal
 from datetime import datetime, timezone
@@ -13,7 +16,19 @@ from fastapi import BackgroundTasks
 from first_model.model.Report import Report
 
 
-app = FastAPI(title="GeoCompliance Mock Server", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Single IO instance for the app lifetime, sharing the module's Database
+    app.state.io = IO(database=dc)
+    yield
+    # The writer thread is a daemon: drain queued messages before the process exits
+    failed = await asyncio.to_thread(app.state.io.flush_writes)
+    if failed:
+        print(f"[shutdown] {failed} queued message write(s) failed")
+
+
+# orjson serialises the larger payloads (documents, audit issues, chat history) several times faster than json
+app = FastAPI(title="GeoCompliance Mock Server", version="0.1.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 dc = Database()
 ch = Chat()
 rp = Report()
@@ -270,8 +285,6 @@ def _get_project_or_404(project_id: str) -> Dict:
         raise HTTPException(status_code=404, detail="Project not found")
 
 def _get_document_or_404(project_id, document_id: str) -> Dict:
-    result = dc.load_document_with_highlighting(int(project_id), int(document_id))
-
     try:
         result = dc.load_document_with_highlighting(int(project_id), int(document_id))
         # print(result)
@@ -296,10 +309,7 @@ def _find_highlight_or_404(doc: Dict, highlight_id: str) -> Dict:
 
 
 # ---------- Endpoints ----------
-# @app.on_event("startup")
-# async def startup_event():
-#     # Single IO instance for the app lifetime
-#     app.state.io = IO()
+# app.state.io is created by lifespan() at startup
 
 def get_io(request: Request) -> IO:
     io = getattr(request.app.state, "io", None)
@@ -391,12 +401,18 @@ async def add_law(file: UploadFile = File(...)):
     contents = await file.read()
     text = contents.decode("utf-8")
     parser.parse(content=text)
+    Parser.finalize_index(parser.vx)
     bill = parser.get_bill()
     ids = dc.get_project_ids()
     for id in ids:
         audit_project(id, dc,  bill)
     return {"ok": True, "message": "File uploaded and printed successfully."}
 
+@app.get("/audit/{project_id}/stream")
+async def audit_stream(project_id: int, max_scenarios: int = 3, io: IO = Depends(get_io)):
+    # NDJSON: a "started" line, one "issue" line per scenario as it completes, then "done"
+    return StreamingResponse(io.run_audit_pipeline_stream(project_id, max_scenarios=max_scenarios), media_type="application/x-ndjson")
+
 # ---------- Chatbox / Conversation API ----------
 class ChatboxCreateIn(BaseModel):
     conv_id: Optional[int] = None
@@ -415,8 +431,9 @@ def chatbox_create(payload: ChatboxCreateIn, io: IO = Depends(get_io)):
     return res["data"]
 
 @app.get("/chatbox/{conv_id}/history")
-def chatbox_history(conv_id: int, reload: bool = False, io: IO = Depends(get_io)):
-    res = io.get_history(conv_id, reload=reload)
+def chatbox_history(conv_id: int, reload: bool = False, before: Optional[str] = None, limit: Optional[int] = None, io: IO = Depends(get_io)):
+    # Full history by default; ?limit=N for the newest N, ?before=<created_at>&limit=N to page back
+    res = io.get_history(conv_id, reload=reload, before=before, limit=limit)
     if not res["ok"]:
         raise HTTPException(status_code=404 if res["error"] == "chatbox not found; call get_or_create_chatbox first" else 500, detail=res["error"])
     return res["data"]
@@ -428,7 +445,8 @@ def chatbox_message(payload: MessageIn, io: IO = Depends(get_io)):
     if not ensure["ok"]:
         raise HTTPException(status_code=500, detail=ensure["error"])
 
-    res = io.handle_incoming(payload.conv_id, payload.content, run_inference=payload.run_inference)
+    # An unknown conv_id gets a new database-assigned id; post to that one
+    res = io.handle_incoming(ensure["data"]["conv_id"], payload.content, run_inference=payload.run_inference)
     if not res["ok"]:
         raise HTTPException(status_code=500, detail=res["error"])
     return res["data"]
@@ -446,4 +464,5 @@ def root():
     "/chatbox/create",
     "/chatbox/{conv_id}/history",
     "/chatbox/message",
+    "/audit/{project_id}/stream",
     ]}